@@ -1,20 +1,30 @@
 import io
 import os
 import re
-import subprocess 
+import gzip
+import bz2
+import lzma
+import codecs
+import hashlib
+import difflib
+import importlib
+import sys
+import time
+import argparse
+import threading
+import queue
+import subprocess
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from contextlib import redirect_stdout
 from html.parser import HTMLParser
-import zipfile 
- 
+import zipfile
+
 # ==============================================
 # DSL Dictionary Converter - Enhanced Complete Version
 # Version SOBAE - Full DSL Tags Support
 # ==============================================
 
-print("="*60)
-print("DSL Dictionary Converter - Enhanced Complete Version")
-print("By SOBAE")
-print("="*60)
-
 # --- 1. Check Dependencies ---
 
 def check_command(command):
@@ -26,112 +36,151 @@ def check_command(command):
     else:
         return True
 
-if not check_command('python3'):
-    print("ERROR: python3 is required!")
-    exit(1)
-
-# --- 2. User Prompt ---
-
-print("="*60)
-print("STEP 1: File Setup")
-print("="*60)
-
-skip_pyglossary = input("Do you already have the input file (TXT or MTXT) and want to proceed directly to DSL conversion? (y/n): ").strip().lower()
+# ========== Input File and Metadata ==========
+
+# Compressed inputs are detected by their magic bytes, not by extension
+COMPRESSION_MAGIC = (
+    (b'\x1f\x8b', 'gzip', gzip.open),
+    (b'BZh', 'bzip2', bz2.open),
+    (b'\xfd7zXZ\x00', 'xz', lzma.open),
+)
+
+COMPRESSION_EXTENSIONS = ('.gz', '.dz', '.bz2', '.xz')
+
+# Number of lines looked at when auto-detecting the input format
+INPUT_HEAD_LINES = 200
+
+def detect_compression(path):
+    """Return (name, opener) of the compression used by a file, or (None, None)."""
+    with io.open(path, "rb") as f:
+        head = f.read(6)
+    for magic, name, opener in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name, opener
+    return None, None
+
+def open_input_file(path):
+    """Open the input dictionary as UTF-8 text, decompressing it as a stream if needed."""
+    name, opener = detect_compression(path)
+    if opener:
+        return opener(path, "rt", encoding="utf-8")
+    return io.open(path, "r", encoding="utf-8")
+
+# Pipeline stages hand work over in batches through bounded queues,
+# so a fast stage blocks instead of buffering the whole dictionary
+PIPELINE_QUEUE_SIZE = 64
+READ_BATCH_SIZE = 1 << 20     # characters of input per reader batch
+CONVERT_BATCH_SIZE = 256      # entries per conversion task
+
+def read_input_lines(input_file):
+    """Yield the input lines while a reader thread reads and decompresses ahead."""
+    batches = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    stop = threading.Event()
+
+    def reader():
+        try:
+            with open_input_file(input_file) as f:
+                while not stop.is_set():
+                    batch = f.readlines(READ_BATCH_SIZE)
+                    if not batch:
+                        break
+                    batches.put(batch)
+        except Exception as e:
+            batches.put(e)
+        else:
+            batches.put(None)
 
-proceed_to_dsl = False
+    reader_thread = threading.Thread(target=reader, daemon=True)
+    reader_thread.start()
 
-if skip_pyglossary == 'y':
-    print("Skipping Pyglossary and proceeding directly to DSL conversion.")
-    proceed_to_dsl = True
-else:
-    print("\n" + "="*60)
-    print("  STEP 1: Run Pyglossary for manual conversion to MTXT")
-    print("  (Please convert your source dictionary file manually now)")
-    print("="*60)
-    
     try:
-        subprocess.call('pyglossary --cmd', shell=True)
-    except Exception as e:
-        print(f"Error running pyglossary: {e}")
-        exit(1)
-
-    print("\n" + "="*60)
-    answer = input("STEP 2: Do you want to convert the resulting file to .dsl format? (y/n): ").strip().lower()
+        while True:
+            batch = batches.get()
+            if batch is None:
+                return
+            if isinstance(batch, Exception):
+                raise batch
+            yield from batch
+    finally:
+        # Runs on close() too: stop the reader and drain the queue so a
+        # blocked put() returns and the file is closed
+        stop.set()
+        while reader_thread.is_alive():
+            try:
+                batches.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def strip_compression_extension(path):
+    """MyDict.mtxt.gz -> MyDict.mtxt"""
+    root, ext = os.path.splitext(path)
+    if ext.lower() in COMPRESSION_EXTENSIONS:
+        return root
+    return path
+
+def get_input_base_path(input_file):
+    """Input path without its compression extension, if the file is compressed."""
+    if detect_compression(input_file)[0]:
+        return strip_compression_extension(input_file)
+    return input_file
+
+def scan_input_head(input_file):
+    """
+    Look at the first lines of the input and report which separators
+    appear there: (mtxt_separator_found, tab_separator_found).
+    """
+    mtxt_separator_found = False
+    tab_separator_found = False
 
-    if answer == "y":
-        proceed_to_dsl = True
+    with open_input_file(input_file) as f:
+        for i, line in enumerate(f):
+            if i >= INPUT_HEAD_LINES:
+                break
 
-if not proceed_to_dsl:
-    print("DSL conversion skipped. Exiting.")
-    exit(0)
+            stripped_line = line.strip()
 
-# ========== Get Input File and Metadata ==========
+            if "</>" in stripped_line:
+                mtxt_separator_found = True
 
-input_file = input("Enter input file path (e.g., MyDict.txt or MyDict.mtxt): ").strip()
-while not os.path.isfile(input_file):
-    print("File not found, try again.")
-    input_file = input("Enter input file path: ").strip()
+            if "\t" in line and not line.startswith("##"):
+                tab_separator_found = True
 
-dict_name = os.path.splitext(os.path.basename(input_file))[0]
-source_lang = ""
-target_lang = ""
-raw_content_lines = []
+    return mtxt_separator_found, tab_separator_found
 
-mtxt_header_count = 0
-mtxt_separator_found = False
-tab_separator_found = False
+def detect_input_format(input_base_path, mtxt_separator_found, tab_separator_found):
+    """
+    Decide whether the input is MTXT or Tab-separated TXT.
+    Returns (is_mtxt, message); is_mtxt is None if the format could not be detected.
+    """
+    file_extension = input_base_path.lower()
 
-try:
-    with io.open(input_file, "r", encoding="utf-8") as f:
-        for i, line in enumerate(f):
-            raw_content_lines.append(line)
-            
-            if i < 200:
-                stripped_line = line.strip()
-                
-                if stripped_line.startswith("##"):
-                    mtxt_header_count += 1
-                
-                if "</>" in stripped_line:
-                    mtxt_separator_found = True
-                
-                if "\t" in line and not line.startswith("##"):
-                    tab_separator_found = True
-                    
-except Exception as e:
-    print(f"❌ Error reading input file: {e}")
-    exit(1)
-
-file_extension = input_file.lower()
-
-if file_extension.endswith('.mtxt'):
-    is_mtxt = True
-    print("File extension is .mtxt - Processing as MTXT format")
-elif file_extension.endswith('.txt'):
-    if mtxt_separator_found:
-        is_mtxt = True
-        print("File extension is .txt but content appears to be MTXT format (</> found)")
-    else:
-        is_mtxt = False
-        print("File extension is .txt - Processing as Tab-separated TXT format")
-else:
-    if mtxt_separator_found:
-        is_mtxt = True
-        print("Detected MTXT format based on content (</> found)")
-    elif tab_separator_found:
-        is_mtxt = False
-        print("Detected Tab-separated TXT format based on content")
+    if file_extension.endswith('.mtxt'):
+        return True, "File extension is .mtxt - Processing as MTXT format"
+    elif file_extension.endswith('.txt'):
+        if mtxt_separator_found:
+            return True, "File extension is .txt but content appears to be MTXT format (</> found)"
+        else:
+            return False, "File extension is .txt - Processing as Tab-separated TXT format"
     else:
-        print("⚠️ Could not auto-detect file format")
-        user_choice = input("Is this file MTXT format? (y/n): ").strip().lower()
-        is_mtxt = (user_choice == 'y')
-         
-entries_list = []
+        if mtxt_separator_found:
+            return True, "Detected MTXT format based on content (</> found)"
+        elif tab_separator_found:
+            return False, "Detected Tab-separated TXT format based on content"
+        else:
+            return None, "⚠️ Could not auto-detect file format"
+
+class DictEntry:
+    """One DSL card: its headwords and the HTML body to convert."""
+    __slots__ = ('headwords', 'html')
+
+    def __init__(self, headwords, html):
+        self.headwords = headwords
+        self.html = html
 
 def normalize_lang(user_input, default):
     if not user_input:
         return default
-    
+
     u = user_input.strip().lower()
 
     if u in ("en", "eng", "english"):
@@ -152,136 +201,151 @@ def normalize_lang(user_input, default):
         return "JAPANESE"
 
     return user_input.strip().upper()
-    
-if is_mtxt:
-    print("Processing as MTXT format...")
-    
-    content_lines = []
-    for line in raw_content_lines:
-        stripped = line.strip()
-        
-        if stripped.startswith("##name"):
-            dict_name = stripped.split("\t", 1)[1].strip()
-        elif stripped.startswith("##sourceLang"):
-            source_lang = stripped.split("\t", 1)[1].strip()
-        elif stripped.startswith("##targetLang"):
-            target_lang = stripped.split("\t", 1)[1].strip()
-        elif stripped.startswith("##"):
-            continue
-        else:
-            clean_line = line.replace("\\n", "")
-            content_lines.append(clean_line.rstrip("\n"))
-            
-    raw = "\n".join(content_lines)
-    blocks = [b.strip() for b in raw.split("</>") if b.strip()]
 
-    headword_entries = {}
-    links_to_process = {}
-    
-    for block in blocks:
-        lines = [l.strip() for l in block.split("\n") if l.strip()]
-        if not lines:
-            continue
-            
-        headword = lines[0]
-        
-        if len(lines) >= 2 and lines[1].startswith("@@@LINK="):
-            target = lines[1].replace("@@@LINK=", "").strip()
-            links_to_process[headword] = target
+def merge_identical_entries(entries):
+    """
+    Merge entries whose HTML body is identical into one card that carries
+    all their headwords. Cards keep the position of their first occurrence.
+    """
+    merged = []
+    by_body = {}  # body hash -> (card, set of its headwords)
+
+    for entry in entries:
+        html = entry.html
+        if not html:
+            merged.append(entry)
             continue
-        
-        if headword in headword_entries:
-            existing_content = headword_entries[headword]
-            new_content = "\n".join(lines[1:])
-            
-            if existing_content and new_content:
-                headword_entries[headword] = existing_content + "\n[m1]\\ [/m]\n" + new_content
-            elif new_content:
-                headword_entries[headword] = existing_content + new_content
+
+        key = hashlib.sha1(html.encode("utf-8")).digest()
+
+        if key not in by_body:
+            card = DictEntry(list(entry.headwords), html)
+            by_body[key] = (card, set(card.headwords))
+            merged.append(card)
         else:
-            headword_entries[headword] = "\n".join(lines[1:])
+            card, seen = by_body[key]
+            for hw in entry.headwords:
+                if hw not in seen:
+                    seen.add(hw)
+                    card.headwords.append(hw)
+
+    return merged
+
+def load_dictionary(input_file, is_mtxt):
+    """
+    Read the whole input and group it into DSL cards.
+    Returns (entries_list, dict_name, source_lang, target_lang); the metadata
+    comes from the ##name, ##sourceLang and ##targetLang headers of MTXT
+    files and is empty when missing.
+    """
+    dict_name = ""
+    source_lang = ""
+    target_lang = ""
+
+    input_lines = read_input_lines(input_file)
+
+    try:
+        if is_mtxt:
+            content_lines = []
+            for line in input_lines:
+                stripped = line.strip()
+
+                if stripped.startswith("##name"):
+                    dict_name = stripped.split("\t", 1)[1].strip()
+                elif stripped.startswith("##sourceLang"):
+                    source_lang = stripped.split("\t", 1)[1].strip()
+                elif stripped.startswith("##targetLang"):
+                    target_lang = stripped.split("\t", 1)[1].strip()
+                elif stripped.startswith("##"):
+                    continue
+                else:
+                    clean_line = line.replace("\\n", "")
+                    content_lines.append(clean_line.rstrip("\n"))
+
+            raw = "\n".join(content_lines)
+            del content_lines
+            blocks = [b.strip() for b in raw.split("</>") if b.strip()]
+            del raw
+
+            # headword -> DictEntry; link-only words are attached to their target below
+            headword_entries = {}
+            links_to_process = {}
+
+            for block in blocks:
+                lines = [l.strip() for l in block.split("\n") if l.strip()]
+                if not lines:
+                    continue
+
+                headword = sys.intern(lines[0])
+
+                if len(lines) >= 2 and lines[1].startswith("@@@LINK="):
+                    target = lines[1].replace("@@@LINK=", "").strip()
+                    links_to_process[headword] = sys.intern(target)
+                    continue
+
+                if headword in headword_entries:
+                    entry = headword_entries[headword]
+                    new_content = "\n".join(lines[1:])
+
+                    if entry.html and new_content:
+                        entry.html = entry.html + "\n[m1]\\ [/m]\n" + new_content
+                    elif new_content:
+                        entry.html = entry.html + new_content
+                else:
+                    headword_entries[headword] = DictEntry([headword], "\n".join(lines[1:]))
+
+            del blocks
+
+            for linked_word, main_word in links_to_process.items():
+                if main_word in headword_entries:
+                    headword_entries[main_word].headwords.append(linked_word)
+                else:
+                    headword_entries[main_word] = DictEntry([main_word, linked_word], "")
+
+            entries_list = list(headword_entries.values())
+            del headword_entries, links_to_process
 
-    word_groups = {}
-    
-    for headword in headword_entries:
-        word_groups[headword] = [headword]
-        
-    for linked_word, main_word in links_to_process.items():
-        if main_word in word_groups:
-            word_groups[main_word].append(linked_word)
         else:
-            word_groups[main_word] = [main_word, linked_word]
-            headword_entries[main_word] = ""
-
-    for main_head, all_headwords in word_groups.items():
-        html_content = headword_entries.get(main_head, "")
-        if html_content or all_headwords:
-            entries_list.append({
-                'headwords': all_headwords,
-                'html': html_content
-            })
-            
-    if not source_lang:
-        source_lang = normalize_lang(input("Enter Source Language (en/ar/de/fr/es/ru/zh/ja): "), "ENGLISH")
+            headword_entries = {}
 
-    if not target_lang:
-        target_lang = normalize_lang(input("Enter Target Language (en/ar/de/fr/es/ru/zh/ja): "), "ARABIC")
-            
-else:
-    print("Processing as Tab-separated TXT format...")
-    
-    headword_entries = {}
-    
-    for line in raw_content_lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        if line.startswith("##"):
-            continue
-            
-        parts = line.split("\t", 1)
-        
-        if len(parts) != 2:
-            continue
-            
-        head = parts[0].strip()
-        html = parts[1].strip()
-        
-        headwords = [h.strip() for h in head.split("|") if h.strip()]
-        
-        if headwords and html:
-            main_headword = headwords[0]
-            
-            if main_headword in headword_entries:
-                existing_content = headword_entries[main_headword]['html']
-                existing_headwords = headword_entries[main_headword]['headwords']
-                
-                for hw in headwords:
-                    if hw not in existing_headwords:
-                        existing_headwords.append(hw)
-                
-                headword_entries[main_headword]['html'] = existing_content + "\n[m1]\\ [/m]\n" + html
-            else:
-                headword_entries[main_headword] = {
-                    'headwords': headwords,
-                    'html': html
-                }
+            for line in input_lines:
+                line = line.strip()
+                if not line:
+                    continue
 
-    for entry_data in headword_entries.values():
-        entries_list.append(entry_data)
+                if line.startswith("##"):
+                    continue
 
-    if not source_lang:
-        source_lang = normalize_lang(input("Enter Source Language (en/ar/de/fr/es/ru/zh/ja): "), "ENGLISH")
+                parts = line.split("\t", 1)
 
-    if not target_lang:
-        target_lang = normalize_lang(input("Enter Target Language (en/ar/de/fr/es/ru/zh/ja): "), "ARABIC")
+                if len(parts) != 2:
+                    continue
+
+                head = parts[0].strip()
+                html = parts[1].strip()
+
+                headwords = [sys.intern(h.strip()) for h in head.split("|") if h.strip()]
+
+                if headwords and html:
+                    main_headword = headwords[0]
 
+                    if main_headword in headword_entries:
+                        entry = headword_entries[main_headword]
 
-print(f"✅ Successfully loaded {len(entries_list)} entries.")
+                        for hw in headwords:
+                            if hw not in entry.headwords:
+                                entry.headwords.append(hw)
 
-output_file = dict_name + ".dsl"
-print(f"Output DSL file will be: {output_file}")
+                        entry.html = entry.html + "\n[m1]\\ [/m]\n" + html
+                    else:
+                        headword_entries[main_headword] = DictEntry(headwords, html)
+
+            entries_list = list(headword_entries.values())
+            del headword_entries
+    finally:
+        input_lines.close()
+
+    return entries_list, dict_name, source_lang, target_lang
 
 # ========== Enhanced HTML Parser with Full DSL Support ==========
 
@@ -664,141 +728,1110 @@ def clean_dsl_output(text):
 
 # ========== Write DSL File ==========
 
-try:
-    with io.open(output_file, "w", encoding="utf-16") as out:
-        out.write(f'#NAME "{dict_name}"\n')
-        out.write(f'#INDEX_LANGUAGE "{source_lang}"\n')
-        out.write(f'#CONTENTS_LANGUAGE "{target_lang}"\n\n')
+def convert_entry(html_block):
+    """Run one HTML body through the whole HTML -> DSL conversion chain."""
+    dsl_content = convert_html_to_dsl(html_block)
 
-        total_entries = len(entries_list)
-        for idx, entry in enumerate(entries_list, 1):
-            headwords = entry['headwords']
-            html_block = entry['html']
-            
-            
+    if 'wiki' in html_block.lower() or 'wiktionary' in html_block.lower():
+        dsl_content = detect_wiktionary_structure(dsl_content)
 
-            for w in headwords:
-                out.write(w + "\n")
+    dsl_content = fix_phonetic_brackets(dsl_content)
+    dsl_content = format_paragraphs_for_dsl(dsl_content)
+    dsl_content = validate_dsl_tags(dsl_content)
+    dsl_content = clean_dsl_output(dsl_content)
 
-            if not html_block:
-                out.write("\t[m1][/m]\n")
-                continue
+    return dsl_content
 
-            dsl_content = convert_html_to_dsl(html_block)
-            
-            if 'wiki' in html_block.lower() or 'wiktionary' in html_block.lower():
-                dsl_content = detect_wiktionary_structure(dsl_content)
-            
-            dsl_content = fix_phonetic_brackets(dsl_content)
-            dsl_content = format_paragraphs_for_dsl(dsl_content)
-            dsl_content = validate_dsl_tags(dsl_content)
-            dsl_content = clean_dsl_output(dsl_content)
-            
-            out.write(dsl_content + "\n")
+def convert_entry_batch(batch, convert=convert_entry):
+    """Convert a batch of (headwords, html) pairs into the text of their DSL cards."""
+    parts = []
 
-    print(f"\n✅ DSL conversion completed successfully! File: {output_file}")
-    
-    dsl_conversion_success = True
+    for headwords, html_block in batch:
+        for w in headwords:
+            parts.append(w + "\n")
+
+        if not html_block:
+            parts.append("\t[m1][/m]\n")
+            continue
+
+        parts.append(convert(html_block) + "\n")
+
+    return "".join(parts)
 
-except Exception as e:
-    print(f"❌ Error during DSL conversion: {e}")
-    import traceback
-    traceback.print_exc()
-    dsl_conversion_success = False
+def iter_entry_batches(entries_list):
+    for start in range(0, len(entries_list), CONVERT_BATCH_SIZE):
+        yield [(entry.headwords, entry.html) for entry in entries_list[start:start + CONVERT_BATCH_SIZE]]
+
+def start_conversion_pool(entries_list, jobs):
+    """
+    Return a process pool with its workers already running, or None when the
+    entries are converted in this process. The workers are started here, before
+    write_dsl starts its writer thread, so no fork happens while a thread runs.
+    """
+    if jobs <= 1 or len(entries_list) <= CONVERT_BATCH_SIZE:
+        return None
+
+    try:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        # Workers are created lazily on the first submit
+        pool.submit(int).result()
+    except (ImportError, OSError, NotImplementedError) as e:
+        # e.g. Python builds without a working sem_open
+        print(f"⚠️ Worker processes not available ({e}), converting in one process")
+        return None
+
+    return pool
+
+def convert_entries(entries_list, pool=None, jobs=1):
+    """
+    Yield the converted DSL text batch by batch, in entry order. With a pool
+    the batches are converted by its jobs workers, at most 2 * jobs at a time.
+    """
+    if pool is None:
+        for batch in iter_entry_batches(entries_list):
+            yield convert_entry_batch(batch)
+        return
+
+    pending = deque()
+    try:
+        for batch in iter_entry_batches(entries_list):
+            if len(pending) >= 2 * jobs:
+                yield pending.popleft().result()
+            pending.append(pool.submit(convert_entry_batch, batch))
+
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Runs on close() too, when writing stopped early
+        for future in pending:
+            future.cancel()
+
+def write_dsl(output_file, dict_name, source_lang, target_lang, entries_list, jobs=1):
+    """
+    Convert the entries and write the DSL file. Conversion runs in this thread
+    (or in worker processes) while a writer thread encodes and writes to disk.
+    """
+    chunks = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    writer_errors = []
+
+    def writer():
+        try:
+            with io.open(output_file, "w", encoding="utf-16") as out:
+                while True:
+                    chunk = chunks.get()
+                    if chunk is None:
+                        return
+                    out.write(chunk)
+        except Exception as e:
+            writer_errors.append(e)
+            # Keep draining so the converting side never blocks on a full queue
+            while chunks.get() is not None:
+                pass
+
+    pool = start_conversion_pool(entries_list, jobs)
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    converted = convert_entries(entries_list, pool, jobs)
+
+    try:
+        chunks.put(f'#NAME "{dict_name}"\n'
+                   f'#INDEX_LANGUAGE "{source_lang}"\n'
+                   f'#CONTENTS_LANGUAGE "{target_lang}"\n\n')
+
+        for text in converted:
+            if writer_errors:
+                break
+            chunks.put(text)
+    finally:
+        chunks.put(None)
+        writer_thread.join()
+        if pool is not None:
+            # shutdown(cancel_futures=True) needs Python 3.9, so cancel by hand
+            converted.close()
+            pool.shutdown(wait=True)
+
+    if writer_errors:
+        raise writer_errors[0]
 
 # --- 4. Compress Resources ---
 
-if dsl_conversion_success:
-    print("\n" + "="*60)
-    print("STEP 3: Checking for resources folder and compressing it...")
+def compress_resources(res_folder_path, output_file):
+    """ZIP the resources folder beside the DSL file. Returns the ZIP path, or None."""
+    print(f"Searching for resources folder: {res_folder_path}")
+
+    if not os.path.isdir(res_folder_path):
+        print("Resources folder not found. Skipping ZIP compression step.")
+        return None
+
+    zip_output_file = output_file + ".files.zip"
+
+    print(f"Resources folder found. Starting ZIP compression to: {zip_output_file}")
+
+    try:
+        with zipfile.ZipFile(zip_output_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            for root, dirs, files in os.walk(res_folder_path):
+                base_path_len = len(res_folder_path) + 1
+
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    arcname = file_path[base_path_len:]
+
+                    print(f"  Adding file: {arcname}")
+                    zipf.write(file_path, arcname)
+
+        print(f"✅ Resources compression is completing successfully. ZIP file: {zip_output_file}")
+        return zip_output_file
+
+    except Exception as e:
+        print(f"❌ Error during resources ZIP compression: {e}")
+        return None
+
+# --- 5. Compress DSL to DSL.DZ using idzip ---
+
+IDZIP_PATH = "/data/data/com.termux/files/usr/bin/idzip"
+
+def compress_dsl(output_file):
+    """Compress the DSL file to .dsl.dz with idzip. Returns the .dz path, or None."""
+    if not os.path.exists(IDZIP_PATH):
+        print("⚠️ idzip not found in the specified Termux path.")
+        print("Please make sure python-idzip is installed in Termux:")
+        print("  pkg install python-idzip")
+        return None
+
+    print("idzip found in Termux path. Starting DSL compression...")
+
+    try:
+        original_size = os.path.getsize(output_file)
+        print(f"Original file size: {original_size} bytes")
+
+        command = f'{IDZIP_PATH} "{output_file}"'
+        print(f"Running command: {command}")
+
+        result = subprocess.run(command, shell=True, capture_output=True, text=True)
+
+        if result.returncode == 0:
+            print(f"✅ DSL compression completed successfully!")
+            print(f"📁 Compressed file: {output_file}.dz")
+
+            if os.path.exists(output_file + ".dz"):
+                compressed_size = os.path.getsize(output_file + ".dz")
+                if original_size > 0:
+                    compression_ratio = (1 - compressed_size/original_size) * 100
+                    print(f"📊 Compression ratio: {compression_ratio:.1f}%")
+                print("💾 Note: idzip automatically removes the original .dsl file")
+                return output_file + ".dz"
+            else:
+                print("⚠️ Compressed file was not created successfully")
+        else:
+            print(f"❌ Error during DSL compression:")
+            print(f"Error output: {result.stderr}")
+
+    except FileNotFoundError:
+        if os.path.exists(output_file + ".dz"):
+            print(f"✅ DSL conversion completed successfully!")
+            print(f"📁 Final compressed file: {output_file}.dz")
+            print("💾 Note: Original .dsl file was automatically removed by idzip")
+            return output_file + ".dz"
+        else:
+            print("⚠️ Original file removed but compressed file not found")
+
+    except Exception as e:
+        print(f"❌ Error running idzip: {e}")
+
+    return None
+
+# ========== Interactive Mode ==========
+
+def run_interactive():
+    if not check_command('python3'):
+        print("ERROR: python3 is required!")
+        exit(1)
+
+    # --- 2. User Prompt ---
+
+    print("="*60)
+    print("STEP 1: File Setup")
     print("="*60)
-    
-    res_folder_path = input_file + "_res"
 
-    print(f"Searching for resources folder: {res_folder_path}")
+    skip_pyglossary = input("Do you already have the input file (TXT or MTXT) and want to proceed directly to DSL conversion? (y/n): ").strip().lower()
 
-    if os.path.isdir(res_folder_path):
-        zip_output_file = output_file + ".files.zip"
+    proceed_to_dsl = False
 
-        print(f"Resources folder found. Starting ZIP compression to: {zip_output_file}")
+    if skip_pyglossary == 'y':
+        print("Skipping Pyglossary and proceeding directly to DSL conversion.")
+        proceed_to_dsl = True
+    else:
+        print("\n" + "="*60)
+        print("  STEP 1: Run Pyglossary for manual conversion to MTXT")
+        print("  (Please convert your source dictionary file manually now)")
+        print("="*60)
 
         try:
-            with zipfile.ZipFile(zip_output_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(res_folder_path):
-                    base_path_len = len(res_folder_path) + 1 
-                    
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = file_path[base_path_len:] 
+            subprocess.call('pyglossary --cmd', shell=True)
+        except Exception as e:
+            print(f"Error running pyglossary: {e}")
+            exit(1)
 
-                        print(f"  Adding file: {arcname}")
-                        zipf.write(file_path, arcname)
+        print("\n" + "="*60)
+        answer = input("STEP 2: Do you want to convert the resulting file to .dsl format? (y/n): ").strip().lower()
 
-            print(f"✅ Resources compression is completing successfully. ZIP file: {zip_output_file}")
+        if answer == "y":
+            proceed_to_dsl = True
 
-        except Exception as e:
-            print(f"❌ Error during resources ZIP compression: {e}")
+    if not proceed_to_dsl:
+        print("DSL conversion skipped. Exiting.")
+        exit(0)
 
+    # ========== Get Input File and Metadata ==========
+
+    input_file = input("Enter input file path (e.g., MyDict.txt, MyDict.mtxt or MyDict.mtxt.gz): ").strip()
+    while not os.path.isfile(input_file):
+        print("File not found, try again.")
+        input_file = input("Enter input file path: ").strip()
+
+    input_compression, _ = detect_compression(input_file)
+    if input_compression:
+        print(f"Input file is {input_compression} compressed - decompressing on the fly")
+    input_base_path = get_input_base_path(input_file)
+
+    try:
+        mtxt_separator_found, tab_separator_found = scan_input_head(input_file)
+    except Exception as e:
+        print(f"❌ Error reading input file: {e}")
+        exit(1)
+
+    is_mtxt, message = detect_input_format(input_base_path, mtxt_separator_found, tab_separator_found)
+    print(message)
+
+    if is_mtxt is None:
+        user_choice = input("Is this file MTXT format? (y/n): ").strip().lower()
+        is_mtxt = (user_choice == 'y')
+
+    if is_mtxt:
+        print("Processing as MTXT format...")
     else:
-        print("Resources folder not found. Skipping ZIP compression step.")
+        print("Processing as Tab-separated TXT format...")
+
+    try:
+        entries_list, dict_name, source_lang, target_lang = load_dictionary(input_file, is_mtxt)
+    except Exception as e:
+        print(f"❌ Error reading input file: {e}")
+        exit(1)
+
+    if not dict_name:
+        dict_name = os.path.splitext(os.path.basename(input_base_path))[0]
+
+    if not source_lang:
+        source_lang = normalize_lang(input("Enter Source Language (en/ar/de/fr/es/ru/zh/ja): "), "ENGLISH")
+
+    if not target_lang:
+        target_lang = normalize_lang(input("Enter Target Language (en/ar/de/fr/es/ru/zh/ja): "), "ARABIC")
+
+    print(f"✅ Successfully loaded {len(entries_list)} entries.")
+
+    merge_answer = input("Merge entries with identical definitions into one multi-headword card? (y/n): ").strip().lower()
+
+    if merge_answer == 'y':
+        loaded_count = len(entries_list)
+        entries_list = merge_identical_entries(entries_list)
+        print(f"✅ Merged {loaded_count - len(entries_list)} duplicate definitions, {len(entries_list)} cards left.")
+
+    output_file = dict_name + ".dsl"
+    print(f"Output DSL file will be: {output_file}")
+
+    try:
+        write_dsl(output_file, dict_name, source_lang, target_lang, entries_list, os.cpu_count() or 1)
+
+        print(f"\n✅ DSL conversion completed successfully! File: {output_file}")
+
+        dsl_conversion_success = True
+
+    except Exception as e:
+        print(f"❌ Error during DSL conversion: {e}")
+        import traceback
+        traceback.print_exc()
+        dsl_conversion_success = False
+
+    if dsl_conversion_success:
+        print("\n" + "="*60)
+        print("STEP 3: Checking for resources folder and compressing it...")
+        print("="*60)
+
+        compress_resources(input_base_path + "_res", output_file)
+
+    if dsl_conversion_success:
+        print("\n" + "="*60)
+        print("STEP 4: Compressing DSL file to DSL.DZ format...")
+        print("="*60)
+
+        compress_dsl(output_file)
 
-# --- 5. Compress DSL to DSL.DZ using idzip ---
-if dsl_conversion_success:
     print("\n" + "="*60)
-    print("STEP 4: Compressing DSL file to DSL.DZ format...")
+    print("🎉 Process completed successfully!")
     print("="*60)
-    
-    idzip_path = "/data/data/com.termux/files/usr/bin/idzip"
-    
-    if os.path.exists(idzip_path):
-        print("idzip found in Termux path. Starting DSL compression...")
-        
+    print(f"📊 Statistics:")
+    print(f"   • Total entries: {len(entries_list)}")
+    print(f"   • Source language: {source_lang}")
+    print(f"   • Target language: {target_lang}")
+    print(f"   • Dictionary name: {dict_name}")
+    print("="*60)
+
+# ========== Batch Mode ==========
+
+INPUT_EXTENSIONS = ('.txt', '.mtxt')
+
+# Rough peak memory of one conversion per byte of input, used for --max-memory.
+# Measured at ~6.6x on a 1M-entry MTXT file; compressed inputs expand first.
+MEMORY_PER_INPUT_BYTE = 7
+COMPRESSED_INPUT_RATIO = 4
+
+def read_batch_manifest(manifest_file):
+    """
+    Read a Tab-separated manifest, one dictionary per line:
+        path<TAB>source_lang<TAB>target_lang<TAB>format
+    Everything after the path is optional, format is "mtxt" or "txt".
+    Lines starting with # are comments; relative paths are taken from the manifest folder.
+    A line with an unknown format becomes a job with an 'error', failed in the summary.
+    """
+    jobs = []
+    base_dir = os.path.dirname(os.path.abspath(manifest_file))
+
+    with io.open(manifest_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = [p.strip() for p in line.split("\t")] + ["", "", ""]
+            fmt = parts[3].lower()
+            error = ""
+
+            if fmt not in ("", "mtxt", "txt"):
+                error = f"unknown format '{parts[3]}' in manifest"
+                fmt = ""
+
+            jobs.append({
+                'input_file': os.path.join(base_dir, parts[0]),
+                'source_lang': parts[1],
+                'target_lang': parts[2],
+                'format': fmt,
+                'error': error
+            })
+
+    return jobs
+
+def find_batch_inputs(inputs, manifest_file=None):
+    """Return the batch jobs for input files, folders of .txt/.mtxt files and a manifest file."""
+    jobs = read_batch_manifest(manifest_file) if manifest_file else []
+
+    for source in inputs:
+        if os.path.isdir(source):
+            paths = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+            paths = [p for p in paths
+                     if os.path.isfile(p) and strip_compression_extension(p).lower().endswith(INPUT_EXTENSIONS)]
+        else:
+            paths = [source]
+
+        for path in paths:
+            jobs.append({'input_file': path, 'source_lang': '', 'target_lang': '', 'format': '', 'error': ''})
+
+    # The same file given twice would be written twice at the same time; the first listing wins
+    unique_jobs = []
+    seen = set()
+    for job in jobs:
+        path = os.path.abspath(job['input_file'])
+        if path not in seen:
+            seen.add(path)
+            unique_jobs.append(job)
+
+    return unique_jobs
+
+def estimate_conversion_memory(input_file):
+    size = os.path.getsize(input_file) * MEMORY_PER_INPUT_BYTE
+    if detect_compression(input_file)[0]:
+        size *= COMPRESSED_INPUT_RATIO
+    return size
+
+def read_header_name(input_file):
+    """Return the ##name header from the top of an MTXT file, or "" if it has none."""
+    dict_name = ""
+
+    with open_input_file(input_file) as f:
+        for i, line in enumerate(f):
+            if i >= INPUT_HEAD_LINES:
+                break
+
+            stripped = line.strip()
+            if stripped.startswith("##name") and "\t" in stripped:
+                dict_name = stripped.split("\t", 1)[1].strip()
+
+    return dict_name
+
+def resolve_batch_job(job):
+    """
+    Fill in job['is_mtxt'] and job['output_name'] (the DSL file name without .dsl)
+    before scheduling. Raises ValueError when the format cannot be detected.
+    """
+    input_file = job['input_file']
+    input_base_path = get_input_base_path(input_file)
+
+    if job['format']:
+        is_mtxt = (job['format'] == 'mtxt')
+    else:
+        is_mtxt, _ = detect_input_format(input_base_path, *scan_input_head(input_file))
+        if is_mtxt is None:
+            raise ValueError("could not auto-detect file format, set it in the manifest")
+
+    job['is_mtxt'] = is_mtxt
+    job['output_name'] = ((read_header_name(input_file) if is_mtxt else "")
+                          or os.path.splitext(os.path.basename(input_base_path))[0])
+
+def make_output_names_unique(jobs):
+    """
+    Give dictionaries that would write the same DSL file a _2, _3... suffix;
+    the first one listed keeps its name. Returns the indexes of renamed jobs.
+    """
+    taken = set()
+    renamed = []
+
+    for i, job in enumerate(jobs):
+        name = job['output_name']
+        n = 2
+        # casefold: Android and Windows file systems are case-insensitive
+        while name.casefold() in taken:
+            name = f"{job['output_name']}_{n}"
+            n += 1
+
+        if name != job['output_name']:
+            job['output_name'] = name
+            renamed.append(i)
+        taken.add(name.casefold())
+
+    return renamed
+
+def batch_log_path(output_dir, output_name):
+    return os.path.join(output_dir, output_name + ".log")
+
+def batch_convert(job, output_dir, default_source_lang, default_target_lang, merge_identical):
+    """Convert one dictionary of a batch. Its console output goes to a .log file beside the DSL."""
+    started = time.time()
+    input_file = job['input_file']
+    input_base_path = get_input_base_path(input_file)
+
+    with io.open(batch_log_path(output_dir, job['output_name']), "w", encoding="utf-8") as log, redirect_stdout(log):
+        if job['is_mtxt']:
+            print("Processing as MTXT format...")
+        else:
+            print("Processing as Tab-separated TXT format...")
+
+        entries_list, dict_name, source_lang, target_lang = load_dictionary(input_file, job['is_mtxt'])
+
+        # Manifest languages win over the MTXT headers, which win over the batch defaults
+        dict_name = dict_name or os.path.splitext(os.path.basename(input_base_path))[0]
+        source_lang = normalize_lang(job['source_lang'], "") or source_lang or default_source_lang
+        target_lang = normalize_lang(job['target_lang'], "") or target_lang or default_target_lang
+
+        print(f"✅ Successfully loaded {len(entries_list)} entries.")
+
+        if merge_identical:
+            entries_list = merge_identical_entries(entries_list)
+            print(f"✅ {len(entries_list)} cards after merging identical definitions.")
+
+        # Converted in this worker only: the batch pool already runs one dictionary per CPU
+        output_file = os.path.join(output_dir, job['output_name'] + ".dsl")
+        write_dsl(output_file, dict_name, source_lang, target_lang, entries_list)
+        print(f"\n✅ DSL conversion completed successfully! File: {output_file}")
+
+    return {
+        'entries': len(entries_list),
+        'output_file': output_file,
+        'res_folder_path': input_base_path + "_res",
+        'seconds': time.time() - started
+    }
+
+def batch_compress_resources(res_folder_path, output_file, log_path):
+    started = time.time()
+    with io.open(log_path, "a", encoding="utf-8") as log, redirect_stdout(log):
+        compress_resources(res_folder_path, output_file)
+    return None, time.time() - started
+
+def batch_compress_dsl(output_file, log_path):
+    started = time.time()
+    with io.open(log_path, "a", encoding="utf-8") as log, redirect_stdout(log):
+        dz_file = compress_dsl(output_file)
+    return dz_file, time.time() - started
+
+class SerialExecutor:
+    """Stand-in for ProcessPoolExecutor that runs each task in this process as it is submitted."""
+
+    def submit(self, fn, *args):
+        future = Future()
         try:
-            original_size = os.path.getsize(output_file)
-            print(f"Original file size: {original_size} bytes")
-            
-            command = f'{idzip_path} "{output_file}"'
-            print(f"Running command: {command}")
-            
-            result = subprocess.run(command, shell=True, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"✅ DSL compression completed successfully!")
-                print(f"📁 Compressed file: {output_file}.dz")
-                
-                if os.path.exists(output_file + ".dz"):
-                    compressed_size = os.path.getsize(output_file + ".dz")
-                    if original_size > 0:
-                        compression_ratio = (1 - compressed_size/original_size) * 100
-                        print(f"📊 Compression ratio: {compression_ratio:.1f}%")
-                    print("💾 Note: idzip automatically removes the original .dsl file")
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+def start_batch_pool(workers):
+    """Return (pool, workers); falls back to one dictionary at a time in this process."""
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # Workers are created lazily on the first submit
+        pool.submit(int).result()
+    except (ImportError, OSError, NotImplementedError) as e:
+        # e.g. Python builds without a working sem_open
+        print(f"⚠️ Worker processes not available ({e}), converting one dictionary at a time")
+        return SerialExecutor(), 1
+
+    return pool, workers
+
+def print_batch_summary(results):
+    print("\n" + "="*78)
+    print(f"{'Dictionary':<32} {'Entries':>9} {'Time (s)':>9} {'Size (bytes)':>14}  Status")
+    print("-"*78)
+
+    total_seconds = 0.0
+    for result in results:
+        size = ""
+        if result['output_file'] and os.path.exists(result['output_file']):
+            size = os.path.getsize(result['output_file'])
+        total_seconds += result['seconds']
+        print(f"{result['name'][:32]:<32} {result['entries']:>9} {result['seconds']:>9.1f} {size:>14}  {result['status']}")
+
+    print("-"*78)
+    print(f"{len(results)} dictionaries, {total_seconds:.1f} s of work")
+    print("="*78)
+
+def run_batch(args):
+    jobs = find_batch_inputs(args.inputs, args.manifest)
+    if not jobs:
+        print("No .txt or .mtxt input files found.")
+        return
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    workers = max(1, args.jobs)
+    memory_budget = args.max_memory * 2**20 if args.max_memory else None
+    default_source_lang = normalize_lang(args.source_lang, "ENGLISH")
+    default_target_lang = normalize_lang(args.target_lang, "ARABIC")
+
+    results = [{
+        'name': os.path.basename(job['input_file']),
+        'entries': 0,
+        'seconds': 0.0,
+        'output_file': None,
+        'status': "ok"
+    } for job in jobs]
+
+    print(f"Converting {len(jobs)} dictionaries with {workers} workers...")
+
+    waiting = []
+    for i, job in enumerate(jobs):
+        if job['error']:
+            results[i]['status'] = f"❌ {job['error']}"
+            print(f"❌ {results[i]['name']}: {job['error']}")
+            continue
+
+        if not os.path.isfile(job['input_file']):
+            results[i]['status'] = "❌ file not found"
+            print(f"❌ {results[i]['name']}: file not found")
+            continue
+
+        try:
+            resolve_batch_job(job)
+        except Exception as e:
+            results[i]['status'] = f"❌ {e}"
+            print(f"❌ {results[i]['name']}: {e}")
+            continue
+
+        waiting.append(i)
+
+    # Output names are only unique per file name or ##name, so two dictionaries
+    # could otherwise write the same .dsl and .log at the same time
+    waiting_jobs = [jobs[i] for i in waiting]
+    for k in make_output_names_unique(waiting_jobs):
+        i = waiting[k]
+        results[i]['status'] = f"ok, renamed to {jobs[i]['output_name']}.dsl"
+        print(f"⚠️ {results[i]['name']}: output name already used, writing {jobs[i]['output_name']}.dsl")
+
+    for i in waiting:
+        results[i]['name'] = jobs[i]['output_name']
+
+    running = {}  # future -> (job index, task kind, reserved memory)
+    converting = 0
+    memory_in_use = 0
+
+    pool, workers = start_batch_pool(workers)
+
+    with pool:
+        while waiting or running:
+            # Start conversions while a worker is free and the memory budget allows it;
+            # a dictionary bigger than the whole budget still runs, but alone.
+            while waiting and converting < workers:
+                i = waiting[0]
+                memory = estimate_conversion_memory(jobs[i]['input_file'])
+                if memory_budget and memory_in_use and memory_in_use + memory > memory_budget:
+                    break
+
+                waiting.pop(0)
+                future = pool.submit(batch_convert, jobs[i], args.output_dir,
+                                     default_source_lang, default_target_lang, args.merge_identical)
+                running[future] = (i, 'convert', memory)
+                converting += 1
+                memory_in_use += memory
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                i, kind, memory = running.pop(future)
+                result = results[i]
+
+                if kind == 'convert':
+                    converting -= 1
+                    memory_in_use -= memory
+
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    result['status'] = f"❌ {kind} failed: {e}"
+                    print(f"❌ {result['name']}: {kind} failed: {e}")
+                    continue
+
+                if kind == 'convert':
+                    result['entries'] = outcome['entries']
+                    result['output_file'] = outcome['output_file']
+                    result['seconds'] += outcome['seconds']
+                    print(f"✅ {result['name']}: {outcome['entries']} entries converted")
+
+                    # Resources ZIP and .dz compression share the same pool
+                    log_path = batch_log_path(args.output_dir, jobs[i]['output_name'])
+                    if os.path.isdir(outcome['res_folder_path']):
+                        zip_future = pool.submit(batch_compress_resources, outcome['res_folder_path'],
+                                                 outcome['output_file'], log_path)
+                        running[zip_future] = (i, 'zip', 0)
+                    dz_future = pool.submit(batch_compress_dsl, outcome['output_file'], log_path)
+                    running[dz_future] = (i, 'dz', 0)
                 else:
-                    print("⚠️ Compressed file was not created successfully")
+                    output, seconds = outcome
+                    result['seconds'] += seconds
+                    if kind == 'dz' and output:
+                        result['output_file'] = output
+
+    print_batch_summary(results)
+
+# ========== Lookup in Generated DSL ==========
+
+# Sidecar index beside the DSL: a header line, then one line per headword
+#   casefolded headword<TAB>headword<TAB>byte offset of its card
+# sorted so it can be binary searched on disk without loading it.
+INDEX_MAGIC = "#DSLIDX"
+INDEX_VERSION = "3"
+DSL_DIRECTIVES = ("#NAME", "#INDEX_LANGUAGE", "#CONTENTS_LANGUAGE", "#INCLUDE", "#SOURCE_CODE_PAGE")
+CARD_READ_SIZE = 4096
+
+def open_dsl_binary(dsl_file):
+    """Open a .dsl or .dsl.dz file as a seekable binary stream of the uncompressed DSL."""
+    if detect_compression(dsl_file)[0] == 'gzip':
+        try:
+            import idzip
+        except ImportError:
+            # gzip can seek too, but has to decompress everything before the offset
+            print("⚠️ python-idzip not installed, falling back to slow gzip seeking")
+            return gzip.open(dsl_file, "rb")
+        return idzip.IdzipFile(dsl_file)
+    return io.open(dsl_file, "rb")
+
+def detect_dsl_encoding(f):
+    """Return (encoding, offset of the first character) from the DSL byte order mark."""
+    f.seek(0)
+    head = f.read(3)
+    if head.startswith(codecs.BOM_UTF16_LE):
+        return 'utf-16-le', 2
+    if head.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16-be', 2
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8', 3
+    if len(head) > 1 and head[1] == 0:
+        return 'utf-16-le', 0
+    return 'utf-8', 0
+
+def iter_dsl_lines(f, encoding, start):
+    """Yield (byte offset, line) for every line of the DSL from the given offset on."""
+    f.seek(start)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    newline_size = len("\n".encode(encoding))
+    position = start
+    pending = ""
+
+    while True:
+        chunk = f.read(CARD_READ_SIZE)
+        lines = (pending + decoder.decode(chunk, final=not chunk)).split("\n")
+        pending = lines.pop() if chunk else ""
+
+        for line in lines:
+            yield position, line
+            position += len(line.encode(encoding)) + newline_size
+
+        if not chunk:
+            return
+
+def build_dsl_index(dsl_file, index_file):
+    """Scan the DSL once and write the sorted headword -> card offset index."""
+    rows = []
+
+    with open_dsl_binary(dsl_file) as f:
+        encoding, start = detect_dsl_encoding(f)
+        card_offset = None
+        in_header = True
+
+        for position, line in iter_dsl_lines(f, encoding, start):
+            line = line.rstrip("\r")
+
+            # The header is the block of #NAME, #INDEX_LANGUAGE... directives before
+            # the first empty line; anywhere else a leading # is part of the headword
+            if in_header and line.upper().startswith(DSL_DIRECTIVES):
+                continue
+            in_header = False
+
+            if not line:
+                continue
+
+            if line[0].isspace():
+                card_offset = None
+                continue
+            if card_offset is None:
+                card_offset = position
+
+            rows.append((line.casefold(), line, card_offset))
+
+    rows.sort()
+    stat = os.stat(dsl_file)
+
+    with io.open(index_file, "w", encoding="utf-8", newline="\n") as out:
+        out.write(f"{INDEX_MAGIC}\t{INDEX_VERSION}\t{encoding}\t{stat.st_size}\t{stat.st_mtime_ns}\n")
+        for key, headword, offset in rows:
+            out.write(f"{key}\t{headword}\t{offset}\n")
+
+    return len(rows)
+
+def read_index_header(index_file):
+    with io.open(index_file, "rb") as f:
+        return f.readline().decode("utf-8").rstrip("\n").split("\t")
+
+def ensure_dsl_index(dsl_file, rebuild=False):
+    """Return the index path for the DSL, (re)building it when missing or stale."""
+    index_file = dsl_file + ".idx"
+    stat = os.stat(dsl_file)
+
+    if not rebuild and os.path.exists(index_file):
+        header = read_index_header(index_file)
+        if header[:2] == [INDEX_MAGIC, INDEX_VERSION] and header[3:] == [str(stat.st_size), str(stat.st_mtime_ns)]:
+            return index_file
+
+    print(f"Building headword index: {index_file}")
+    count = build_dsl_index(dsl_file, index_file)
+    print(f"✅ Indexed {count} headwords.")
+    return index_file
+
+def search_dsl_index(index_file, query, prefix=False, limit=20):
+    """
+    Binary search the index file on disk for a headword (or a prefix) and
+    return up to limit (headword, card offset) matches.
+    """
+    key = query.casefold().encode("utf-8")
+    matches = []
+
+    with io.open(index_file, "rb") as f:
+        f.readline()
+        data_start = f.tell()
+        f.seek(0, os.SEEK_END)
+        data_end = f.tell()
+
+        def line_at_or_after(pos):
+            # First full line starting at or after pos
+            if pos > data_start:
+                f.seek(pos - 1)
+                f.readline()
             else:
-                print(f"❌ Error during DSL compression:")
-                print(f"Error output: {result.stderr}")
-                
-        except FileNotFoundError:
-            if os.path.exists(output_file + ".dz"):
-                print(f"✅ DSL conversion completed successfully!")
-                print(f"📁 Final compressed file: {output_file}.dz")
-                print("💾 Note: Original .dsl file was automatically removed by idzip")
+                f.seek(data_start)
+            return f.readline()
+
+        lo, hi = data_start, data_end
+        while lo < hi:
+            mid = (lo + hi) // 2
+            line = line_at_or_after(mid)
+            if not line or line.split(b"\t", 1)[0] >= key:
+                hi = mid
             else:
-                print("⚠️ Original file removed but compressed file not found")
-                
+                lo = mid + 1
+
+        line = line_at_or_after(lo)
+        while line and len(matches) < limit:
+            line_key, headword, offset = line.rstrip(b"\n").split(b"\t")
+            if line_key != key and not (prefix and line_key.startswith(key)):
+                break
+            matches.append((headword.decode("utf-8"), int(offset)))
+            line = f.readline()
+
+    return matches
+
+def read_dsl_card(f, encoding, offset):
+    """Read the card (headword lines and body) that starts at the given byte offset."""
+    card_lines = []
+    in_body = False
+
+    for position, line in iter_dsl_lines(f, encoding, offset):
+        line = line.rstrip("\r")
+        if line and not line[0].isspace():
+            if in_body:
+                break
+        elif line:
+            in_body = True
+        card_lines.append(line)
+
+    return "\n".join(card_lines).rstrip()
+
+def run_lookup(args):
+    if not os.path.isfile(args.dsl_file):
+        print(f"❌ DSL file not found: {args.dsl_file}")
+        sys.exit(1)
+
+    index_file = ensure_dsl_index(args.dsl_file, args.rebuild_index)
+    encoding = read_index_header(index_file)[2]
+    missing = 0
+
+    with open_dsl_binary(args.dsl_file) as f:
+        for query in args.query:
+            matches = search_dsl_index(index_file, query, args.prefix, args.limit)
+            if not matches:
+                print(f"❌ No entry found for: {query}")
+                missing += 1
+                continue
+
+            shown = set()
+            for headword, offset in matches:
+                if offset in shown:
+                    continue
+                shown.add(offset)
+                print(read_dsl_card(f, encoding, offset))
+                print()
+
+    if missing:
+        sys.exit(1)
+
+# ========== Golden Corpus Check ==========
+
+# Real-world style entries, one file per entry class, with the reference
+# output of each class kept beside it in <class>.expected
+GOLDEN_CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+def load_golden_corpus(corpus_dir):
+    """Return [(entry class, expected output path, entries_list)] for every corpus file."""
+    corpus = []
+
+    for name in sorted(os.listdir(corpus_dir)):
+        if not name.lower().endswith(INPUT_EXTENSIONS):
+            continue
+
+        path = os.path.join(corpus_dir, name)
+        is_mtxt, _ = detect_input_format(path, *scan_input_head(path))
+        entries_list = load_dictionary(path, is_mtxt)[0]
+        entry_class = os.path.splitext(name)[0]
+        corpus.append((entry_class, os.path.join(corpus_dir, entry_class + ".expected"), entries_list))
+
+    return corpus
+
+def load_engine(spec):
+    """Import an alternate html -> DSL function given as module:function."""
+    module_name, _, function_name = spec.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Engine must be given as module:function, not '{spec}'")
+
+    sys.path.insert(0, os.getcwd())
+    return getattr(importlib.import_module(module_name), function_name)
+
+def split_dsl_cards(text):
+    """Split DSL card text into cards: headword lines followed by their indented body."""
+    cards = []
+    in_body = False
+
+    for line in text.splitlines(keepends=True):
+        if line.strip() and not line[0].isspace():
+            if in_body or not cards:
+                cards.append("")
+                in_body = False
+        elif line.strip():
+            in_body = True
+        cards[-1] += line
+
+    return cards
+
+def render_golden_cards(entries_list, convert):
+    """
+    Convert each entry on its own. Returns (card texts, errors, seconds spent);
+    an entry that raises gets a placeholder card and an (index, exception) error.
+    """
+    cards = []
+    errors = []
+    started = time.perf_counter()
+
+    for i, entry in enumerate(entries_list):
+        try:
+            cards.append(convert_entry_batch([(entry.headwords, entry.html)], convert))
         except Exception as e:
-            print(f"❌ Error running idzip: {e}")
+            cards.append(f"{entry.headwords[0]}\n\t<< {type(e).__name__}: {e} >>\n")
+            errors.append((i, e))
+
+    return cards, errors, time.perf_counter() - started
+
+def best_render_time(entries_list, convert, repeat):
+    return min(render_golden_cards(entries_list, convert)[2] for _ in range(repeat))
+
+def report_golden_errors(entry_class, label, entries_list, errors):
+    for i, e in errors:
+        print(f"❌ {entry_class}: {label} failed on entry {i + 1} ({entries_list[i].headwords[0]}): {type(e).__name__}: {e}")
+
+def diff_golden_cards(entry_class, expected_label, expected_cards, actual_label, actual_cards, max_diffs):
+    """Print a diff for every card that differs. Returns the number of differing cards."""
+    mismatches = 0
+
+    for i in range(max(len(expected_cards), len(actual_cards))):
+        expected = expected_cards[i] if i < len(expected_cards) else ""
+        actual = actual_cards[i] if i < len(actual_cards) else ""
+        if expected == actual:
+            continue
+
+        mismatches += 1
+        if mismatches <= max_diffs:
+            headword = (expected or actual).split("\n", 1)[0]
+            print(f"❌ {entry_class}: entry {i + 1} ({headword}) differs")
+            print("".join(difflib.unified_diff(expected.splitlines(keepends=True), actual.splitlines(keepends=True),
+                                               expected_label, actual_label)))
+
+    return mismatches
+
+def run_verify(args):
+    engine = load_engine(args.engine) if args.engine else None
+    corpus = load_golden_corpus(args.corpus)
+    rows = []
+    failures = 0
+
+    for entry_class, expected_file, entries_list in corpus:
+        reference_cards, reference_errors, _ = render_golden_cards(entries_list, convert_entry)
+
+        # A crash of the reference is a failure on its own, never an expected output
+        if reference_errors:
+            report_golden_errors(entry_class, "reference", entries_list, reference_errors)
+            failures += len(reference_errors)
+            rows.append([entry_class, len(entries_list), None, "", "", "error"])
+            continue
+
+        if args.update:
+            with io.open(expected_file, "w", encoding="utf-8", newline="\n") as out:
+                out.write("".join(reference_cards))
+            print(f"📝 Wrote reference output: {expected_file}")
+        elif not os.path.exists(expected_file):
+            print(f"❌ {entry_class}: expected output {expected_file} is missing, create it with --update")
+            failures += 1
+        else:
+            with io.open(expected_file, "r", encoding="utf-8", newline="") as f:
+                expected_cards = split_dsl_cards(f.read())
+            failures += diff_golden_cards(entry_class, expected_file, expected_cards,
+                                          "reference", split_dsl_cards("".join(reference_cards)), args.max_diffs)
+
+        reference_seconds = best_render_time(entries_list, convert_entry, args.repeat)
+        row = [entry_class, len(entries_list), reference_seconds * 1000, "", "", ""]
+
+        if engine:
+            engine_cards, engine_errors, _ = render_golden_cards(entries_list, engine)
+            report_golden_errors(entry_class, args.engine, entries_list, engine_errors)
+            mismatches = diff_golden_cards(entry_class, "reference", reference_cards,
+                                           args.engine, engine_cards, args.max_diffs)
+            failures += mismatches
+
+            # Timing an engine that raises would only measure its error path
+            if engine_errors:
+                row[5] = mismatches
+            else:
+                engine_seconds = best_render_time(entries_list, engine, args.repeat)
+                speedup = reference_seconds / engine_seconds if engine_seconds else float("inf")
+                row[3:] = [f"{engine_seconds * 1000:.2f}", f"{speedup:.2f}x", mismatches]
+
+        rows.append(row)
+
+    print("\n" + "="*78)
+    print(f"{'Entry class':<24} {'Entries':>8} {'Reference (ms)':>15} {'Engine (ms)':>12} {'Speedup':>8} {'Diffs':>6}")
+    print("-"*78)
+    for entry_class, count, reference_ms, engine_ms, speedup, mismatches in rows:
+        reference_ms = "" if reference_ms is None else f"{reference_ms:.2f}"
+        print(f"{entry_class:<24} {count:>8} {reference_ms:>15} {engine_ms:>12} {speedup:>8} {mismatches:>6}")
+    print("="*78)
+
+    if failures:
+        print(f"❌ {failures} failures")
+        sys.exit(1)
+
+    print("✅ All entries match")
+
+# ========== Command Line ==========
+
+def print_banner():
+    print("="*60)
+    print("DSL Dictionary Converter - Enhanced Complete Version")
+    print("By SOBAE")
+    print("="*60)
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert TXT/MTXT dictionaries to DSL. Run without arguments for the interactive mode.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    batch_parser = subparsers.add_parser("batch", help="convert many dictionaries concurrently")
+    batch_parser.add_argument("inputs", nargs="*", help="input files, or folders to scan for .txt/.mtxt files")
+    batch_parser.add_argument("-m", "--manifest", help="Tab-separated manifest: path, source lang, target lang, format")
+    batch_parser.add_argument("-o", "--output-dir", default=".", help="where to write the DSL files and logs (default: current folder)")
+    batch_parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="number of worker processes (default: CPU count)")
+    batch_parser.add_argument("--max-memory", type=int, metavar="MB", help="estimated memory budget for concurrent conversions")
+    batch_parser.add_argument("--source-lang", default="", help="source language when neither manifest nor file sets it (default: ENGLISH)")
+    batch_parser.add_argument("--target-lang", default="", help="target language when neither manifest nor file sets it (default: ARABIC)")
+    batch_parser.add_argument("--merge-identical", action="store_true", help="merge entries with identical definitions into one card")
+
+    lookup_parser = subparsers.add_parser("lookup", help="look up headwords in a generated .dsl or .dsl.dz file")
+    lookup_parser.add_argument("dsl_file", help="the .dsl or .dsl.dz file; a .idx index is built beside it on first use")
+    lookup_parser.add_argument("query", nargs="+", help="headwords to look up (case-insensitive)")
+    lookup_parser.add_argument("-p", "--prefix", action="store_true", help="match every headword starting with the query")
+    lookup_parser.add_argument("--limit", type=int, default=20, help="maximum matches per query (default: 20)")
+    lookup_parser.add_argument("--rebuild-index", action="store_true", help="rebuild the index even if it looks up to date")
+
+    verify_parser = subparsers.add_parser("verify", help="check the conversion against the golden corpus")
+    verify_parser.add_argument("--engine", metavar="MODULE:FUNCTION", help="alternate html -> DSL function to diff against the reference convert_entry")
+    verify_parser.add_argument("--corpus", default=GOLDEN_CORPUS_DIR, help="corpus folder (default: golden/ beside this script)")
+    verify_parser.add_argument("--repeat", type=int, default=5, help="timing runs per entry class, the best one counts (default: 5)")
+    verify_parser.add_argument("--max-diffs", type=int, default=10, help="diffs printed per entry class (default: 10)")
+    verify_parser.add_argument("--update", action="store_true", help="rewrite the .expected reference outputs")
+
+    args = parser.parse_args()
+
+    if args.command == "batch" and not (args.inputs or args.manifest):
+        parser.error("batch needs input files, folders or a --manifest")
+
+    if args.command == "batch" and args.manifest and not os.path.isfile(args.manifest):
+        parser.error(f"manifest not found: {args.manifest}")
+
+    if args.command == "batch":
+        print_banner()
+        run_batch(args)
+    elif args.command == "lookup":
+        run_lookup(args)
+    elif args.command == "verify":
+        run_verify(args)
     else:
-        print("⚠️ idzip not found in the specified Termux path.")
-        print("Please make sure python-idzip is installed in Termux:")
-        print("  pkg install python-idzip")
+        print_banner()
+        run_interactive()
 
-print("\n" + "="*60)
-print("🎉 Process completed successfully!")
-print("="*60)
-print(f"📊 Statistics:")
-print(f"   • Total entries: {len(entries_list)}")
-print(f"   • Source language: {source_lang}")
-print(f"   • Target language: {target_lang}")
-print(f"   • Dictionary name: {dict_name}")
-print("="*60)
+if __name__ == "__main__":
+    main()